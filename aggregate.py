@@ -0,0 +1,68 @@
+# aggregate.py
+# Trenton Sedlacek ECON 8320
+# combined employment and weighted wage for any group of sectors
+# keeps everything as numpy arrays so a new selection is just a mask
+
+import numpy as np
+
+import store
+
+
+class SectorCube:
+    def __init__(self, data, sectors):
+        # data is a dataset.Dataset, sectors maps key -> {"emp": col, "wage": col or None}
+        self.keys = [k for k, v in sectors.items() if v["emp"] in data]
+        self.pos = {k: i for i, k in enumerate(self.keys)}
+        self.dates = data.dates
+        
+        n_rows, n_sectors = len(data), len(self.keys)
+        # time x sector, C order so one month across all sectors is contiguous
+        self.emp = np.zeros((n_rows, n_sectors))
+        self.bill = np.zeros((n_rows, n_sectors))
+        self.has_wage = np.zeros(n_sectors, dtype=bool)
+        
+        for i, key in enumerate(self.keys):
+            emp = data[sectors[key]["emp"]].astype(np.float64)
+            # missing employment counts as 0, same as DataFrame.sum(axis=1)
+            self.emp[:, i] = np.nan_to_num(emp)
+            wage = sectors[key]["wage"]
+            if wage and wage in data:
+                self.has_wage[i] = True
+                bill = store.wagebill_col(wage)
+                if bill in data:
+                    self.bill[:, i] = data[bill]
+                else:
+                    self.bill[:, i] = data[wage].astype(np.float64) * emp
+    
+    def mask(self, keys, wages_only=False):
+        m = np.zeros(len(self.keys), dtype=bool)
+        m[[self.pos[k] for k in keys if k in self.pos]] = True
+        if wages_only:
+            m &= self.has_wage
+        return m
+    
+    def index_range(self, start, end):
+        # first and last row inside [start, end], dates are sorted
+        i0 = np.searchsorted(self.dates, np.datetime64(start), side="left")
+        i1 = np.searchsorted(self.dates, np.datetime64(end), side="right") - 1
+        return int(i0), int(i1)
+    
+    def employment(self, keys, i0, i1):
+        # combined employment at the start and end of the range
+        m = self.mask(keys)
+        if not m.any():
+            return None
+        start, end = self.emp[[i0, i1]][:, m].sum(axis=1)
+        return start, end
+    
+    def weighted_wage(self, keys, i0, i1):
+        # employment weighted wage at the start and end of the range
+        # a missing wage anywhere makes that month missing, like before
+        m = self.mask(keys, wages_only=True)
+        if not m.any():
+            return None
+        rows = [i0, i1]
+        bill = self.bill[rows][:, m].sum(axis=1)
+        emp = self.emp[rows][:, m].sum(axis=1)
+        start, end = bill / emp
+        return start, end
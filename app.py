@@ -1,12 +1,16 @@
 # BLS Dashboard
 # Trenton Sedlacek ECON 8320
 
+import numpy as np
 import streamlit as st
 import streamlit.components.v1 as components
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import os
+import aggregate
+import dataset
+import figures
+import instrument
+import registry
+import revisions
+import store
 
 st.set_page_config(page_title="BLS Dashboard", layout="wide")
 
@@ -64,67 +68,73 @@ def linkedin_badge():
     """
 
 # the 11 supersectors (they dont overlap so they add up to total nonfarm)
-SECTORS = {
-    "mining": {"emp": "mining_emp", "wage": "mining_wage", "label": "Mining and Logging"},
-    "construction": {"emp": "construction_emp", "wage": "construction_wage", "label": "Construction"},
-    "manufacturing": {"emp": "manufacturing_emp", "wage": "manufacturing_wage", "label": "Manufacturing"},
-    "ttu": {"emp": "ttu_emp", "wage": "ttu_wage", "label": "Trade, Trans, Utilities"},
-    "information": {"emp": "information_emp", "wage": "information_wage", "label": "Information"},
-    "financial": {"emp": "financial_emp", "wage": "financial_wage", "label": "Financial Activities"},
-    "profbusiness": {"emp": "profbusiness_emp", "wage": "profbusiness_wage", "label": "Professional/Business"},
-    "eduhealth": {"emp": "eduhealth_emp", "wage": "eduhealth_wage", "label": "Education and Health"},
-    "leisure": {"emp": "leisure_emp", "wage": "leisure_wage", "label": "Leisure and Hospitality"},
-    "otherservices": {"emp": "otherservices_emp", "wage": "otherservices_wage", "label": "Other Services"},
-    "government": {"emp": "government_emp", "wage": None, "label": "Government"},
-}
+# and the prettier names for the raw data table, both from data/series.csv
+REGISTRY = registry.load()
+SECTORS = REGISTRY.sectors
+COLUMN_LABELS = REGISTRY.labels
+
+@st.cache_resource
+def live_data():
+    # one per server process, reloads itself when the collector writes new files
+    return dataset.LiveDataset()
+
+@st.cache_resource(max_entries=4)
+def vintage_data(version, vintage):
+    # the data as it was after an older collector run, rebuilt from the revision log
+    # only the runs someone actually picks get built
+    with instrument.span("rebuild_vintage", vintage=vintage):
+        snapshot = revisions.snapshot(revisions.read_log(), vintage)
+    return dataset.from_frame(snapshot, f"{version}@{vintage}")
+
+@st.cache_data(max_entries=2)
+def vintage_list(version):
+    # newest first, the log only changes when the data version does
+    return revisions.vintages()[::-1]
+
+@st.cache_resource(max_entries=2)
+def load_cube(version, _data):
+    # employment and wage x employment as arrays, shared by every session
+    return aggregate.SectorCube(_data, SECTORS)
+
+
+def stop_recording():
+    # closes this run's recorder, which also turns tracemalloc back off
+    st.session_state.pop("debug_recorder", None)
+    instrument.stop(local=True)
 
-# prettier names for the raw data table
-COLUMN_LABELS = {
-    "date": "Date",
-    "total_nonfarm": "Total Nonfarm",
-    "total_private": "Total Private",
-    "unemployment_rate": "Unemployment Rate (%)",
-    "lfpr": "Labor Force Participation (%)",
-    "total_private_wage": "Avg Hourly Wage ($)",
-    "mining_emp": "Mining Employment",
-    "construction_emp": "Construction Employment",
-    "manufacturing_emp": "Manufacturing Employment",
-    "ttu_emp": "Trade/Trans/Util Employment",
-    "information_emp": "Information Employment",
-    "financial_emp": "Financial Employment",
-    "profbusiness_emp": "Prof/Business Employment",
-    "eduhealth_emp": "Education/Health Employment",
-    "leisure_emp": "Leisure/Hospitality Employment",
-    "otherservices_emp": "Other Services Employment",
-    "government_emp": "Government Employment",
-    "mining_wage": "Mining Wage ($)",
-    "construction_wage": "Construction Wage ($)",
-    "manufacturing_wage": "Manufacturing Wage ($)",
-    "ttu_wage": "Trade/Trans/Util Wage ($)",
-    "information_wage": "Information Wage ($)",
-    "financial_wage": "Financial Wage ($)",
-    "profbusiness_wage": "Prof/Business Wage ($)",
-    "eduhealth_wage": "Education/Health Wage ($)",
-    "leisure_wage": "Leisure/Hospitality Wage ($)",
-    "otherservices_wage": "Other Services Wage ($)",
-}
 
-@st.cache_data
-def load_data():
-    path = "data/bls_data.csv"
-    if not os.path.exists(path):
-        return None
-    df = pd.read_csv(path, parse_dates=["date"])
-    return df.sort_values("date")
+# debug timings, only recorded while the toggle at the bottom of the sidebar is on
+# the toggle is drawn later but its value is already in session state by now
+# every rerun is a new thread, so a recorder from a run that got cut short
+# (e.g. by clicking something mid run) is found through session state instead
+left_over = st.session_state.pop("debug_recorder", None)
+if left_over is not None:
+    left_over.close()
+recorder = None
+if st.session_state.get("debug"):
+    recorder = instrument.start(memory=st.session_state.get("debug_memory", False), local=True)
+    st.session_state["debug_recorder"] = recorder
 
-df = load_data()
+with instrument.span("load_data"):
+    data = live_data().get()
 
-if df is None or df.empty:
+if data is None:
     st.error("No data found. Run collect_data.py first.")
+    stop_recording()
     st.stop()
 
-min_date = df["date"].min().date()
-max_date = df["date"].max().date()
+@st.cache_data(max_entries=2)
+def available_sectors(version, _columns):
+    # sectors that have employment data, worked out once per data version
+    columns = set(_columns)
+    return [k for k, v in SECTORS.items() if v["emp"] in columns]
+
+
+@st.cache_data(max_entries=16, show_spinner="Writing file...")
+def export_file(date_range, columns, fmt, version, _df):
+    # keyed on date range, columns, format and data version, _df isnt hashed
+    return store.export_frame(_df, fmt, list(columns))
+
 
 # sidebar stuff
 with st.sidebar:
@@ -134,6 +144,15 @@ with st.sidebar:
     
     st.header("Controls")
     
+    # older vintages show the numbers as they were first published, before revisions
+    as_of = st.selectbox("Data as of", ["Latest"] + vintage_list(data.version))
+    if as_of != "Latest":
+        data = vintage_data(data.version, as_of)
+    
+    version = data.version
+    min_date = data.min_date
+    max_date = data.max_date
+    
     date_range = st.slider(
         "Date Range",
         min_value=min_date,
@@ -141,16 +160,25 @@ with st.sidebar:
         value=(min_date, max_date),
         format="MMM YYYY"
     )
+    
+    # charts only, the numbers and raw data stay monthly
+    freq = st.selectbox("Frequency", ["Monthly"] + list(data.rollups))
 
-# date filter
-mask = (df["date"].dt.date >= date_range[0]) & (df["date"].dt.date <= date_range[1])
-filtered = df[mask].copy()
-filtered_max = filtered["date"].max().date()
+# date filter, a view into the shared data so dont modify it
+with instrument.span("date_filter") as span:
+    filtered = data.between(date_range[0], date_range[1])
+    filtered_max = filtered.max_date
+    # other frequencies come precomputed from the collector, nothing gets resampled here
+    if freq == "Monthly":
+        chart_data = filtered
+    else:
+        chart_data = data.rollups[freq].between(date_range[0], date_range[1])
+    span.set(rows=len(filtered), chart_rows=len(chart_data))
 
 with st.sidebar:
     st.markdown("---")
     
-    available = [k for k, v in SECTORS.items() if v["emp"] in filtered.columns]
+    available = available_sectors(version, data.columns)
     
     if available:
         select_all = st.checkbox("Select All Sectors", value=False)
@@ -173,6 +201,13 @@ with st.sidebar:
     st.markdown("---")
     st.info(f"Latest: {filtered_max.strftime('%B %Y')}")
     st.info(f"Records: {len(filtered)}")
+    
+    st.markdown("---")
+    st.toggle("Debug timings", key="debug")
+    if recorder:
+        st.checkbox("Track memory (slower)", key="debug_memory")
+    # filled in at the very end once everything has been timed
+    debug_box = st.container()
 
 
 st.title("US Labor Statistics Dashboard")
@@ -180,12 +215,13 @@ st.caption("Data from Bureau of Labor Statistics. Updates monthly via GitHub Act
 
 
 def get_metric(col):
-    if col not in filtered.columns:
+    if col not in filtered:
         return None, None
-    vals = filtered[col].dropna()
+    vals = filtered[col]
+    vals = vals[~np.isnan(vals)]
     if len(vals) < 2:
         return None, None
-    return vals.iloc[-1], vals.iloc[-1] - vals.iloc[0]
+    return vals[-1], vals[-1] - vals[0]
 
 
 # national totals
@@ -216,183 +252,160 @@ if selected:
     
     s1, s2 = st.columns(2)
     
+    with instrument.span("aggregate", sectors=len(selected)):
+        cube = load_cube(version, data)
+        i0, i1 = cube.index_range(date_range[0], date_range[1])
+        emp = cube.employment(selected, i0, i1)
+        # weighted avg so bigger sectors count more
+        wage = cube.weighted_wage(selected, i0, i1)
+    
     with s1:
-        emp_cols = [SECTORS[s]["emp"] for s in selected if SECTORS[s]["emp"] in filtered.columns]
-        if emp_cols and len(filtered) >= 2:
-            total_emp = filtered[emp_cols].sum(axis=1)
-            latest = total_emp.iloc[-1]
-            change = latest - total_emp.iloc[0]
-            st.metric("Combined Employment", f"{latest:,.0f}K", f"{change:+,.0f}K")
+        if emp and i1 > i0:
+            start, latest = emp
+            st.metric("Combined Employment", f"{latest:,.0f}K", f"{latest - start:+,.0f}K")
         else:
             st.metric("Combined Employment", "N/A")
     
     with s2:
-        sectors_with_wages = [s for s in selected if SECTORS[s]["wage"] and SECTORS[s]["wage"] in filtered.columns]
-        
-        if sectors_with_wages and len(filtered) >= 2:
-            wage_cols = [SECTORS[s]["wage"] for s in sectors_with_wages]
-            emp_cols = [SECTORS[s]["emp"] for s in sectors_with_wages]
-            
-            # weighted avg so bigger sectors count more
-            weighted_sum = sum(filtered[w] * filtered[e] for w, e in zip(wage_cols, emp_cols))
-            total_emp = filtered[emp_cols].sum(axis=1)
-            weighted_avg = weighted_sum / total_emp
-            
-            latest = weighted_avg.iloc[-1]
-            change = latest - weighted_avg.iloc[0]
-            st.metric("Avg Hourly Wage", f"${latest:.2f}", f"${change:+.2f}")
+        if wage and i1 > i0:
+            start, latest = wage
+            st.metric("Avg Hourly Wage", f"${latest:.2f}", f"${latest - start:+.2f}")
         else:
             st.metric("Avg Hourly Wage", "N/A")
     
     st.caption("Wage is weighted average by employment.")
 
-# tabs
-st.markdown("---")
-tab1, tab2, tab3 = st.tabs(["Overview", "Sector Employment", "Sector Wages"])
+# views
+# only the picked view runs, so the other two dont build any charts on a rerun
+# (st.tabs would run all three and just hide two of them)
 
-with tab1:
+def show_chart(chart_id, sectors=()):
+    # get_figure is just a cache lookup unless the inputs changed,
+    # plotly_chart is where the figure gets turned into json for the browser
+    with instrument.span("figure", chart=chart_id):
+        fig = figures.get_figure(chart_id, date_range, sectors, freq, version, chart_data, SECTORS)
+    with instrument.span("send_chart", chart=chart_id):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def overview_view():
     st.header("National Overview")
     
     col1, col2 = st.columns(2)
-    
-    with col1:
-        if "total_nonfarm" in filtered.columns and filtered["total_nonfarm"].notna().any():
-            fig = px.line(filtered, x="date", y="total_nonfarm", title="Total Nonfarm Employment")
-            fig.update_layout(yaxis_title="Thousands", xaxis_title="")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No data")
-    
-    with col2:
-        if "unemployment_rate" in filtered.columns and filtered["unemployment_rate"].notna().any():
-            fig = px.line(filtered, x="date", y="unemployment_rate", title="Unemployment Rate")
-            fig.update_traces(line_color="red")
-            fig.update_layout(yaxis_title="Percent", xaxis_title="")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No data")
-    
     col3, col4 = st.columns(2)
     
-    with col3:
-        if "lfpr" in filtered.columns and filtered["lfpr"].notna().any():
-            fig = px.line(filtered, x="date", y="lfpr", title="Labor Force Participation")
-            fig.update_traces(line_color="green")
-            fig.update_layout(yaxis_title="Percent", xaxis_title="")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No data")
-    
-    with col4:
-        if "total_private_wage" in filtered.columns and filtered["total_private_wage"].notna().any():
-            fig = px.line(filtered, x="date", y="total_private_wage", title="Avg Hourly Earnings")
-            fig.update_traces(line_color="orange")
-            fig.update_layout(yaxis_title="Dollars", xaxis_title="")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No data")
+    for box, col in zip([col1, col2, col3, col4], figures.OVERVIEW_CHARTS):
+        with box:
+            if chart_data.has_data(col):
+                show_chart(col)
+            else:
+                st.info("No data")
 
-with tab2:
+
+def employment_view():
     st.header("Sector Employment Comparison")
     
     if not selected:
         st.info("Pick some sectors from the sidebar")
-    else:
-        fig = go.Figure()
-        for sec in selected:
-            col = SECTORS[sec]["emp"]
-            if col in filtered.columns:
-                fig.add_trace(go.Scatter(
-                    x=filtered["date"], y=filtered[col],
-                    name=SECTORS[sec]["label"], mode="lines"
-                ))
-        
-        fig.update_layout(
-            title="Employment by Sector (Thousands)", height=500,
-            yaxis=dict(rangemode="tozero", title="Thousands"),
-            xaxis_title="", hovermode="x unified",
-            legend=dict(orientation="h", y=-0.15)
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # yoy growth
-        if len(filtered) >= 12:
-            st.subheader("Year over Year Growth")
-            fig = go.Figure()
-            
-            for sec in selected:
-                col = SECTORS[sec]["emp"]
-                if col in filtered.columns:
-                    growth = filtered[col].pct_change(12) * 100
-                    fig.add_trace(go.Scatter(
-                        x=filtered["date"], y=growth,
-                        name=SECTORS[sec]["label"], mode="lines"
-                    ))
-            
-            fig.update_layout(
-                height=400, yaxis_title="Percent", xaxis_title="",
-                hovermode="x unified", legend=dict(orientation="h", y=-0.15)
-            )
-            fig.add_hline(y=0, line_dash="dash", line_color="gray")
-            st.plotly_chart(fig, use_container_width=True)
-
-with tab3:
+        return
+    
+    sectors = tuple(selected)
+    show_chart("sector_emp", sectors)
+    
+    # yoy growth
+    if len(filtered) >= 12:
+        st.subheader("Year over Year Growth")
+        show_chart("sector_emp_yoy", sectors)
+
+
+def wages_view():
     st.header("Sector Wages Comparison")
     
     if not selected:
         st.info("Pick some sectors from the sidebar")
-    else:
-        with_wages = [s for s in selected if SECTORS[s]["wage"] and SECTORS[s]["wage"] in filtered.columns]
-        without_wages = [s for s in selected if s not in with_wages]
-        
-        if without_wages:
-            missing = ", ".join([SECTORS[s]["label"] for s in without_wages])
-            st.warning(f"No wage data for: {missing}")
-        
-        if with_wages:
-            fig = go.Figure()
-            for sec in with_wages:
-                col = SECTORS[sec]["wage"]
-                fig.add_trace(go.Scatter(
-                    x=filtered["date"], y=filtered[col],
-                    name=SECTORS[sec]["label"], mode="lines"
-                ))
-            
-            fig.update_layout(
-                title="Avg Hourly Earnings by Sector", height=500,
-                yaxis=dict(rangemode="tozero", title="Dollars"),
-                xaxis_title="", hovermode="x unified",
-                legend=dict(orientation="h", y=-0.15)
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            if len(filtered) >= 12:
-                st.subheader("Year over Year Wage Growth")
-                fig = go.Figure()
-                
-                for sec in with_wages:
-                    col = SECTORS[sec]["wage"]
-                    growth = filtered[col].pct_change(12) * 100
-                    fig.add_trace(go.Scatter(
-                        x=filtered["date"], y=growth,
-                        name=SECTORS[sec]["label"], mode="lines"
-                    ))
-                
-                fig.update_layout(
-                    height=400, yaxis_title="Percent", xaxis_title="",
-                    hovermode="x unified", legend=dict(orientation="h", y=-0.15)
-                )
-                fig.add_hline(y=0, line_dash="dash", line_color="gray")
-                st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("None of the selected sectors have wage data")
+        return
+    
+    with_wages = [s for s in selected if SECTORS[s]["wage"] and SECTORS[s]["wage"] in filtered]
+    without_wages = [s for s in selected if s not in with_wages]
+    
+    if without_wages:
+        missing = ", ".join([SECTORS[s]["label"] for s in without_wages])
+        st.warning(f"No wage data for: {missing}")
+    
+    if not with_wages:
+        st.info("None of the selected sectors have wage data")
+        return
+    
+    sectors = tuple(with_wages)
+    show_chart("sector_wage", sectors)
+    
+    if len(filtered) >= 12:
+        st.subheader("Year over Year Wage Growth")
+        show_chart("sector_wage_yoy", sectors)
+
+
+VIEWS = {
+    "Overview": overview_view,
+    "Sector Employment": employment_view,
+    "Sector Wages": wages_view,
+}
 
-# raw data
 st.markdown("---")
-with st.expander("Raw Data"):
-    display_df = filtered.rename(columns={c: COLUMN_LABELS.get(c, c) for c in filtered.columns})
-    st.dataframe(display_df.sort_values("Date", ascending=False), use_container_width=True)
-    st.download_button("Download CSV", filtered.to_csv(index=False), "bls_data.csv")
+view = st.radio("View", list(VIEWS), horizontal=True, label_visibility="collapsed", key="view")
+with instrument.span("view", view=view):
+    VIEWS[view]()
+
+# raw data, only built when someone asks for it
+st.markdown("---")
+if st.toggle("Show raw data"):
+    raw_cols = ["date"] + [c for c in filtered.columns if not store.is_derived(c)]
+    # labels through column_config and a reversed view, so no renamed/sorted copy
+    with instrument.span("raw_table"):
+        st.dataframe(
+            filtered.to_frame(raw_cols).iloc[::-1],
+            column_config={c: COLUMN_LABELS.get(c, c) for c in raw_cols},
+            use_container_width=True,
+        )
+    
+    e1, e2 = st.columns([1, 3])
+    fmt = e1.selectbox("Format", list(store.EXPORT_FORMATS))
+    picked = e2.multiselect(
+        "Columns (all if empty)",
+        options=[c for c in raw_cols if c != "date"],
+        format_func=lambda c: COLUMN_LABELS.get(c, c),
+    )
+    
+    # the file only gets written when someone asks for it
+    if st.button("Prepare download"):
+        with instrument.span("export", format=fmt):
+            file_data = export_file(date_range, tuple(picked), fmt, version, filtered.to_frame(raw_cols))
+        ext, mime = store.EXPORT_FORMATS[fmt]
+        st.download_button(f"Download {fmt}", file_data, f"bls_data.{ext}", mime=mime)
 
 st.markdown("---")
 st.caption("Data: U.S. Bureau of Labor Statistics | Trenton Sedlacek")
+
+# debug panel, everything above has been timed by now
+# span fields that arent shown as details
+SPAN_FIELDS = {"span", "start", "seconds", "depth", "parent", "thread", "mem_mb"}
+
+if recorder:
+    with debug_box:
+        st.caption(f"This run: {recorder.elapsed() * 1000:.0f} ms")
+        rows = []
+        for s in sorted(recorder.spans, key=lambda s: s["start"]):
+            row = {
+                "stage": ". " * s["depth"] + s["span"],
+                "ms": round(s["seconds"] * 1000, 1),
+                "details": ", ".join(f"{k}={v}" for k, v in s.items() if k not in SPAN_FIELDS),
+            }
+            if "mem_mb" in s:
+                row["MB"] = s["mem_mb"]
+            rows.append(row)
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        for name, n in recorder.counters.items():
+            st.caption(f"{name}: {n}")
+        st.caption(f"Data in memory: {data.nbytes / 1e6:.2f} MB ({len(data)} rows x {len(data.columns)} columns)")
+
+# nothing left to time, close the recorder before the next run
+stop_recording()
@@ -0,0 +1,207 @@
+# bench.py
+# Trenton Sedlacek ECON 8320
+# times the collector and dashboard code paths on made up data that looks like BLS
+#
+#   python bench.py                      # 10x, 100x and 1000x
+#   python bench.py --scales 10 100      # just some of them
+#   python bench.py --compare old.json new.json
+#
+# a scale of N means N times the series we track now (27). history grows too,
+# N times the ~112 months we keep now, but capped at 1939 when CES starts.
+# results go to bench_results/<commit>.json so runs can be compared across commits
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import aggregate
+import collect_data
+import dataset
+import figures
+import store
+
+BASE_SERIES = 27
+BASE_MONTHS = 112
+CURRENT_YEAR = datetime.now().year
+MAX_MONTHS = (CURRENT_YEAR - 1939) * 12
+RESULTS_DIR = "bench_results"
+
+# same as the dashboard default
+SELECTED = 11
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def make_sectors(n_series):
+    # half employment, half wages, paired up like the real supersectors
+    n_sectors = max(1, n_series // 2)
+    return {
+        f"s{i}": {"emp": f"s{i}_emp", "wage": f"s{i}_wage", "label": f"Sector {i}"}
+        for i in range(n_sectors)
+    }
+
+
+def make_response(columns, end_year, n_months, rng):
+    # one API response for a chunk of series, newest first with M13 averages
+    # like the real thing. series ids are the column names so no mapping needed
+    series = []
+    for col in columns:
+        level = rng.uniform(20, 20000)
+        items = []
+        for k in range(n_months):
+            year = end_year - k // 12
+            month = 12 - k % 12
+            if month == 12:
+                items.append({"year": str(year), "period": "M13", "periodName": "Annual Average",
+                              "value": f"{level:.1f}", "footnotes": [{}]})
+            items.append({"year": str(year), "period": f"M{month:02d}", "periodName": "x",
+                          "value": f"{level * (1 + 0.001 * k):.1f}", "footnotes": [{}]})
+        series.append({"seriesID": col, "data": items})
+    return {"status": "REQUEST_SUCCEEDED", "message": [], "Results": {"series": series}}
+
+
+def timed(results, scale, stage, fn, repeat=1, **info):
+    # best of repeat runs, returns whatever fn returned on the last run
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    results.append({"scale": scale, "stage": stage, "seconds": round(best, 6), **info})
+    print(f"  {stage:<18} {best * 1000:10.1f} ms")
+    return out
+
+
+def run_scale(scale, results, rng):
+    n_series = BASE_SERIES * scale
+    n_months = min(BASE_MONTHS * scale, MAX_MONTHS)
+    sectors = make_sectors(n_series)
+    columns = [c for s in sectors.values() for c in (s["emp"], s["wage"])]
+    end_year = CURRENT_YEAR
+    size = {"series": len(columns), "months": n_months}
+    print(f"\n{scale}x: {len(columns)} series x {n_months} months")
+    
+    # parse, one 50 series response at a time like the collector gets them
+    # responses are made and thrown away per chunk so 1000x fits in memory
+    frames = []
+    parse_seconds = 0.0
+    for i in range(0, len(columns), collect_data.MAX_SERIES_KEY):
+        response = make_response(columns[i:i + collect_data.MAX_SERIES_KEY], end_year, n_months, rng)
+        start = time.perf_counter()
+        frames.append(collect_data.parse_response(response))
+        parse_seconds += time.perf_counter() - start
+    results.append({"scale": scale, "stage": "parse_response", "seconds": round(parse_seconds, 6), **size})
+    print(f"  {'parse_response':<18} {parse_seconds * 1000:10.1f} ms")
+    
+    wide = timed(results, scale, "combine_frames", lambda: collect_data.combine_frames(frames), **size)
+    del frames
+    
+    # store files go in a temp folder, the store uses relative data/ paths
+    here = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs("data")
+            
+            def write_store():
+                # the same writes as the end of collect_data.main
+                store.write_csv(wide)
+                store.write_parquet(wide)
+                store.write_parquet(store.build_derived(wide), store.DERIVED_FILE)
+                store.write_rollups(store.build_rollups(wide))
+                return store.write_manifest()
+            
+            manifest = timed(results, scale, "write_store", write_store, **size)
+            data = timed(results, scale, "load_data", lambda: dataset.load(manifest["version"]), **size)
+        finally:
+            os.chdir(here)
+    
+    # a typical rerun: middle half of the history, default number of sectors
+    dates = data.dates
+    start, end = pd.Timestamp(dates[len(dates) // 4]).date(), pd.Timestamp(dates[-1]).date()
+    picked = list(sectors)[:SELECTED]
+    
+    filtered = timed(results, scale, "date_filter", lambda: data.between(start, end), repeat=5, **size)
+    cube = timed(results, scale, "sector_cube", lambda: aggregate.SectorCube(data, sectors), **size)
+    
+    def aggregate_selected():
+        i0, i1 = cube.index_range(start, end)
+        return cube.employment(picked, i0, i1), cube.weighted_wage(picked, i0, i1)
+    
+    timed(results, scale, "aggregate", aggregate_selected, repeat=5, **size)
+    
+    series = [(sectors[s]["emp"], sectors[s]["label"]) for s in picked]
+    fig = timed(results, scale, "build_figure",
+                lambda: figures.sector_lines(filtered, series, "Employment", "Thousands", False),
+                repeat=3, **size)
+    timed(results, scale, "serialize_figure", lambda: fig.to_json(), repeat=3, **size)
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(r["scale"], r["stage"]): r["seconds"] for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    
+    print(f"{'scale':>6} {'stage':<18} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for r in new:
+        before = old.get((r["scale"], r["stage"]))
+        if before is None:
+            continue
+        ratio = r["seconds"] / before if before else float("nan")
+        print(f"{r['scale']:>6} {r['stage']:<18} {before * 1000:10.1f} {r['seconds'] * 1000:10.1f} {ratio:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collector and dashboard code")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--out", help="where to write the results (default bench_results/<commit>.json)")
+    parser.add_argument("--seed", type=int, default=8320)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="print the change between two result files and exit")
+    args = parser.parse_args()
+    
+    if args.compare:
+        compare(*args.compare)
+        return
+    
+    rng = np.random.default_rng(args.seed)
+    commit = git_commit()
+    results = []
+    for scale in args.scales:
+        run_scale(scale, results, rng)
+    
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
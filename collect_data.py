@@ -4,114 +4,533 @@
 
 import requests
 import json
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
 import os
+import random
+import threading
+import time
 
-API_URL = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
-OUTPUT_FILE = "data/bls_data.csv"
-
-# series IDs from BLS
-# employment ones end in 01, wages end in 03
-# these are the 11 supersectors which add up to total nonfarm without double counting
-SERIES = {
-    # main stuff
-    "CES0000000001": "total_nonfarm",
-    "CES0500000001": "total_private",
-    "LNS14000000": "unemployment_rate",
-    "LNS11300000": "lfpr",
-    
-    # employment for each sector
-    "CES1000000001": "mining_emp",
-    "CES2000000001": "construction_emp",
-    "CES3000000001": "manufacturing_emp",
-    "CES4000000001": "ttu_emp",
-    "CES5000000001": "information_emp",
-    "CES5500000001": "financial_emp",
-    "CES6000000001": "profbusiness_emp",
-    "CES6500000001": "eduhealth_emp",
-    "CES7000000001": "leisure_emp",
-    "CES8000000001": "otherservices_emp",
-    "CES9000000001": "government_emp",
-    
-    # wages for each sector (govt doesnt have this)
-    "CES0500000003": "total_private_wage",
-    "CES1000000003": "mining_wage",
-    "CES2000000003": "construction_wage",
-    "CES3000000003": "manufacturing_wage",
-    "CES4000000003": "ttu_wage",
-    "CES5000000003": "information_wage",
-    "CES5500000003": "financial_wage",
-    "CES6000000003": "profbusiness_wage",
-    "CES6500000003": "eduhealth_wage",
-    "CES7000000003": "leisure_wage",
-    "CES8000000003": "otherservices_wage",
-}
-
-
-def fetch_from_bls(series_list, start_year, end_year, api_key=None):
-    payload = {
-        "seriesid": series_list,
-        "startyear": str(start_year),
-        "endyear": str(end_year),
-    }
+import instrument
+import registry
+import revisions
+import store
+
+# can be pointed at a local stub server for testing
+API_URL = os.environ.get("BLS_API_URL", "https://api.bls.gov/publicAPI/v2/timeseries/data/")
+OUTPUT_FILE = store.CSV_FILE
+PARQUET_FILE = store.PARQUET_FILE
+DERIVED_FILE = store.DERIVED_FILE
+ROLLUP_FILE = store.ROLLUP_FILE
+
+# how many requests can be in flight at once
+# BLS allows 50 requests per 10 seconds so keep this small
+MAX_WORKERS = int(os.environ.get("BLS_MAX_WORKERS", 4))
+
+# parsing is plain cpu work so it goes to worker processes instead of threads
+# BLS_PARSE_WORKERS=1 parses everything in this process
+PARSE_WORKERS = int(os.environ.get("BLS_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+PARSE_MIN_CHUNKS = 8
+
+# daily query limits, registered keys get a lot more
+DAILY_LIMIT_KEY = 500
+DAILY_LIMIT_PUBLIC = 25
+
+# raw responses are cached on disk so reruns dont burn quota
+CACHE_DIR = os.environ.get("BLS_CACHE_DIR", ".cache/bls")
+CACHE_TTL = float(os.environ.get("BLS_CACHE_TTL", 12 * 60 * 60))  # seconds
+CACHE_MAX_FILES = int(os.environ.get("BLS_CACHE_MAX_FILES", 500))
+
+# finished chunks of the current run, cleared once the run saves
+# so a crashed run picks up where it left off even with --no-cache
+# anything older than a day is from some other run and gets ignored
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, "checkpoint")
+CHECKPOINT_TTL = 24 * 60 * 60
+
+# retries with jittered exponential backoff for throttling and server hiccups
+MAX_RETRIES = int(os.environ.get("BLS_MAX_RETRIES", 5))
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_MAX = 60.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+REQUEST_TIMEOUT = 60
+
+# offline only replays cached responses (or fixtures) and never calls the API
+OFFLINE = os.environ.get("BLS_OFFLINE") == "1"
+
+# per request limits, public API is 20 series / 10 years
+# registered keys get 50 series / 20 years
+MAX_SERIES_KEY = 50
+MAX_SERIES_PUBLIC = 20
+MAX_YEARS_KEY = 20
+MAX_YEARS_PUBLIC = 10
+
+# how far back a full refresh goes by default
+LOOKBACK_YEARS = 9
+
+# each release revises the previous two months, so always refetch those
+REVISION_MONTHS = 2
+
+# series IDs from BLS, see data/series.csv
+SERIES = registry.load().series
+
+
+def make_session(pool_size=MAX_WORKERS):
+    # one keep-alive session shared by all the threads
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def cache_key(series_list, start_year, end_year):
+    # api key is left out on purpose so everyone shares the same entries
+    raw = json.dumps([list(series_list), str(start_year), str(end_year)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_path(key, directory=CACHE_DIR):
+    return os.path.join(directory, f"{key}.json")
+
+
+def cache_fresh(key, ttl=CACHE_TTL, directory=CACHE_DIR):
+    path = cache_path(key, directory)
+    if not os.path.exists(path):
+        return False
+    return ttl is None or time.time() - os.path.getmtime(path) <= ttl
+
+
+def cache_get(key, ttl=CACHE_TTL, directory=CACHE_DIR):
+    if not cache_fresh(key, ttl, directory):
+        return None
+    path = cache_path(key, directory)
+    with open(path) as f:
+        data = json.load(f)
+    # bump access time for LRU, mtime stays as the write time for TTL
+    os.utime(path, (time.time(), os.path.getmtime(path)))
+    return data
+
+
+def cache_put(key, data, directory=CACHE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    # write to a temp file first so a crash never leaves half a file
+    path = cache_path(key, directory)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def clear_checkpoint():
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return
+    for name in os.listdir(CHECKPOINT_DIR):
+        os.remove(os.path.join(CHECKPOINT_DIR, name))
+
+
+def prune_cache(ttl=CACHE_TTL, max_files=CACHE_MAX_FILES):
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    now = time.time()
+    entries = []
+    removed = 0
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        st = os.stat(path)
+        if ttl is not None and now - st.st_mtime > ttl:
+            os.remove(path)
+            removed += 1
+        else:
+            entries.append((st.st_atime, path))
     
-    if api_key:
-        payload["registrationkey"] = api_key
+    # drop the least recently used ones if there are still too many
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) - max_files)]:
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+class RetryableError(Exception):
+    pass
+
+
+class RetryBudget:
+    # requests left in the daily limit after every chunk gets its first try,
+    # shared by the fetch threads so retries cant use up the whole quota
+    def __init__(self, spare):
+        self.spare = spare
+        self.lock = threading.Lock()
+    
+    def take(self):
+        with self.lock:
+            if self.spare <= 0:
+                return False
+            self.spare -= 1
+            return True
+
+
+def backoff_delay(attempt):
+    # full jitter so parallel workers dont all come back at the same moment
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def is_no_data(message):
+    return message.startswith("No Data Available")
+
+
+def check_response(data):
+    status = data.get("status")
+    messages = data.get("message") or []
     
+    if status == "REQUEST_SUCCEEDED":
+        return
+    # a "no data" note for a series or year isnt worth failing the chunk over
+    if messages and all(is_no_data(m) for m in messages):
+        return
+    # running out of daily quota wont fix itself by retrying
+    if any("threshold" in m.lower() for m in messages):
+        raise Exception(f"BLS error: {messages}")
+    if status == "REQUEST_NOT_PROCESSED":
+        raise RetryableError(f"BLS did not process the request: {messages}")
+    raise Exception(f"BLS error: {messages}")
+
+
+def post_with_retries(payload, session=None, max_retries=MAX_RETRIES, budget=None):
+    # every retry is another request against the daily limit, budget=None doesnt check
     headers = {"Content-type": "application/json"}
-    resp = requests.post(API_URL, data=json.dumps(payload), headers=headers)
+    post = session.post if session else requests.post
     
-    if resp.status_code != 200:
-        raise Exception(f"API returned {resp.status_code}")
+    for attempt in range(max_retries + 1):
+        if attempt > 0 and budget is not None and not budget.take():
+            raise Exception(f"Out of daily requests for retries after {attempt} tries: {error}")
+        try:
+            instrument.count("requests")
+            resp = post(API_URL, data=json.dumps(payload), headers=headers, timeout=REQUEST_TIMEOUT)
+            if resp.status_code in RETRY_STATUS:
+                raise RetryableError(f"API returned {resp.status_code}")
+            if resp.status_code != 200:
+                raise Exception(f"API returned {resp.status_code}")
+            data = resp.json()
+            check_response(data)
+            return data
+        except (RetryableError, requests.ConnectionError, requests.Timeout) as e:
+            error = e
+            if attempt == max_retries:
+                raise Exception(f"Giving up after {max_retries + 1} tries: {e}")
+            delay = backoff_delay(attempt)
+            instrument.count("retries")
+            print(f"    {e}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def fetch_from_bls(series_list, start_year, end_year, api_key=None, session=None,
+                   use_cache=True, offline=OFFLINE, budget=None):
+    key = cache_key(series_list, start_year, end_year)
+    # one span per chunk, source says where the response came from
+    with instrument.span("fetch", series=len(series_list), first=series_list[0],
+                         years=f"{start_year}-{end_year}") as span:
+        if offline:
+            # replay mode ignores the TTL, whatever is on disk is good enough
+            data = cache_get(key, ttl=None)
+            if data is None:
+                raise Exception(f"Offline and nothing cached for {len(series_list)} series {start_year}-{end_year}")
+            span.set(source="offline")
+            return data
+        
+        # finished earlier in a run that didnt make it to the end
+        data = cache_get(key, CHECKPOINT_TTL, CHECKPOINT_DIR)
+        if data is not None:
+            span.set(source="checkpoint")
+            return data
+        if use_cache:
+            data = cache_get(key)
+            if data is not None:
+                span.set(source="cache")
+                return data
+        
+        payload = {
+            "seriesid": series_list,
+            "startyear": str(start_year),
+            "endyear": str(end_year),
+        }
+        
+        if api_key:
+            payload["registrationkey"] = api_key
+        
+        span.set(source="api")
+        data = post_with_retries(payload, session, budget=budget)
+        
+        # just note the "no data" ones, there can be one per series
+        messages = data.get("message") or []
+        no_data = [m for m in messages if is_no_data(m)]
+        if no_data:
+            print(f"    warning: {len(no_data)} 'no data' notes for {start_year}-{end_year}, e.g. {no_data[0]}")
+            span.set(no_data=len(no_data))
+        for message in messages:
+            if not is_no_data(message):
+                print(f"    warning: {message}")
+        
+        cache_put(key, data, CHECKPOINT_DIR)
+        if use_cache:
+            cache_put(key, data)
+        return data
+
+
+def fetch_chunks(jobs, api_key=None, max_workers=MAX_WORKERS, use_cache=True, offline=OFFLINE,
+                 keep=True):
+    # jobs is a list of (series_list, start_year, end_year)
+    # keep=False doesnt hold on to the responses, theyre all on disk anyway
+    # (see saved_response) so a big backfill's raw json doesnt sit in memory
+    # make sure we wont blow through the daily limit before sending anything
+    # cached and checkpointed responses dont count against it
+    budget = None
+    if not offline:
+        limit = DAILY_LIMIT_KEY if api_key else DAILY_LIMIT_PUBLIC
+        uncached = []
+        for job in jobs:
+            key = cache_key(*job)
+            if cache_fresh(key, CHECKPOINT_TTL, CHECKPOINT_DIR) or (use_cache and cache_fresh(key)):
+                continue
+            uncached.append(job)
+        if len(uncached) > limit:
+            raise Exception(f"{len(uncached)} requests is over the daily limit of {limit}")
+        # whatever the first tries dont use is all the retries get
+        budget = RetryBudget(limit - len(uncached))
+        if len(uncached) < len(jobs):
+            print(f"  {len(jobs) - len(uncached)} chunks already on disk")
     
-    data = resp.json()
-    if data.get("status") != "REQUEST_SUCCEEDED":
-        raise Exception(f"BLS error: {data.get('message')}")
+    workers = max(1, min(max_workers, len(jobs)))
+    with make_session(workers) as session:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(fetch_from_bls, chunk, start, end, api_key, session, use_cache, offline, budget)
+                for chunk, start, end in jobs
+            ]
+            # collect in job order so the output matches a serial run
+            # let every chunk finish so the good ones get checkpointed
+            results, errors = [], []
+            for i, f in enumerate(futures):
+                try:
+                    data = f.result()
+                    results.append(data if keep else None)
+                except Exception as e:
+                    errors.append(f"chunk {i+1}: {e}")
+                # the future holds on to the response too
+                futures[i] = None
     
-    return data
+    if errors:
+        for error in errors:
+            print(f"  failed {error}")
+        raise Exception(f"{len(errors)} of {len(jobs)} chunks failed, rerun to fetch just those")
+    return results
 
 
-def parse_response(response):
-    rows = []
+def saved_response(job):
+    # where a finished chunk sits on disk, fetch_from_bls checkpoints everything
+    # it downloads, cache and offline hits are already in the cache
+    key = cache_key(*job)
+    if cache_fresh(key, CHECKPOINT_TTL, CHECKPOINT_DIR):
+        return cache_path(key, CHECKPOINT_DIR)
+    return cache_path(key)
+
+
+def plan_requests(starts, end_year, api_key=None):
+    # starts maps series id -> first year we want
+    # split into year windows the API will accept, crossed with series chunks
+    max_series = MAX_SERIES_KEY if api_key else MAX_SERIES_PUBLIC
+    max_years = MAX_YEARS_KEY if api_key else MAX_YEARS_PUBLIC
+    
+    jobs = []
+    for start_year in sorted(set(starts.values())):
+        group = [s for s in starts if starts[s] == start_year]
+        
+        # newest window first so recent data lands first
+        windows = []
+        window_end = end_year
+        while window_end >= start_year:
+            window_start = max(start_year, window_end - max_years + 1)
+            windows.append((window_start, window_end))
+            window_end = window_start - 1
+        
+        for window_start, window_end in windows:
+            for i in range(0, len(group), max_series):
+                jobs.append((group[i:i+max_series], window_start, window_end))
+    return jobs
+
+
+def combine_frames(dataframes):
+    # pieces for the same series chunk (different year windows) get stacked and
+    # collapsed to one row per month, groupby last keeps whichever piece has the value
+    # then the chunks go side by side. stacking every chunk at once would make
+    # a (months x chunks) by (every series) frame thats almost all empty
+    groups = {}
+    for df in dataframes:
+        groups.setdefault(tuple(df.columns), []).append(df)
+    parts = [pd.concat(g, ignore_index=True).groupby("date").last() for g in groups.values()]
+    
+    result = pd.concat(parts, axis=1).sort_index()
+    if result.columns.has_duplicates:
+        # a series missing from some windows ends up in two chunks, later one wins
+        result = result.T.groupby(level=0, sort=False).last().T
+    
+    # same column order as the pieces came in
+    order = list(dict.fromkeys(c for df in dataframes for c in df.columns if c != "date"))
+    result = result[order].copy()
+    result.index.name = "date"
+    return result.reset_index()
+
+
+def parse_columns(response):
+    # pull the raw fields for every series into flat arrays and filter them
+    # in bulk instead of building a dict for every observation
+    # returns (column names, int32 months since 1970, months x columns values)
+    # or None, plain arrays so its cheap to send back from a worker process
+    names, counts = [], []
+    years, periods, values = [], [], []
     
     for series in response.get("Results", {}).get("series", []):
+        items = series.get("data", [])
         series_id = series.get("seriesID")
-        col_name = SERIES.get(series_id, series_id)
-        
-        for item in series.get("data", []):
-            period = item.get("period", "")
-            
-            # M01 thru M12 are monthly, M13 is annual avg so skip it
-            if not period.startswith("M") or period == "M13":
-                continue
-            
-            year = item.get("year")
-            month = int(period.replace("M", ""))
-            
-            try:
-                value = float(item.get("value"))
-                rows.append({
-                    "date": f"{year}-{month:02d}-01",
-                    "column": col_name,
-                    "value": value
-                })
-            except (ValueError, TypeError):
-                pass
-    
-    if not rows:
-        return pd.DataFrame()
+        names.append(SERIES.get(series_id, series_id))
+        counts.append(len(items))
+        years.extend([item.get("year") for item in items])
+        periods.extend([item.get("period", "") for item in items])
+        values.extend([item.get("value") for item in items])
+    
+    if not values:
+        return None
+    
+    # M01 thru M12 are monthly, M13 is annual avg so skip it
+    period = pd.Series(periods, dtype=object).fillna("").astype(str)
+    monthly = (period.str.startswith("M") & (period != "M13")).to_numpy()
+    
+    value = pd.to_numeric(pd.Series(values, dtype=object)[monthly], errors="coerce")
+    value = value.astype(float).to_numpy()
+    ok = ~np.isnan(value)
+    if not ok.any():
+        return None
+    value = value[ok]
+    
+    # months since 1970, dates stay plain ints until the end
+    year = pd.Series(years, dtype=object)[monthly][ok].astype(int).to_numpy()
+    month = period[monthly][ok].str[1:].astype(int).to_numpy()
+    ordinal = (year - 1970) * 12 + month - 1
+    
+    # columns come out sorted like the old pivot_table did
+    columns, col_codes = np.unique(np.array(names, dtype=object), return_inverse=True)
+    col = np.repeat(col_codes, counts)[monthly][ok]
     
-    # pivot to wide format
-    df = pd.DataFrame(rows)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.pivot_table(index="date", columns="column", values="value", aggfunc="last")
-    df = df.reset_index().sort_values("date")
+    months, row = np.unique(ordinal, return_inverse=True)
     
+    # keep the last value for each (column, month) like aggfunc="last"
+    key = col * len(months) + row
+    _, last = np.unique(key[::-1], return_index=True)
+    keep = len(key) - 1 - last
+    
+    wide = np.full((len(months), len(columns)), np.nan)
+    wide[row[keep], col[keep]] = value[keep]
+    
+    # drop columns that ended up with nothing in them
+    has_data = np.zeros(len(columns), dtype=bool)
+    has_data[col] = True
+    
+    return list(columns[has_data]), months.astype(np.int32), wide[:, has_data]
+
+
+def columns_to_frame(parsed):
+    # back to the wide frame with a date column that the rest of the collector uses
+    if parsed is None:
+        return pd.DataFrame()
+    columns, months, values = parsed
+    dates = pd.to_datetime([f"{m}-01" for m in months.astype("datetime64[M]").astype(str)])
+    df = pd.DataFrame(
+        values,
+        index=pd.Index(dates, name="date"),
+        columns=pd.Index(columns, name="column"),
+        copy=False,
+    )
+    return df.reset_index()
+
+
+def parse_response(response):
+    return columns_to_frame(parse_columns(response))
+
+
+def parse_file(path):
+    # runs in a worker process: read one saved response and parse it there,
+    # so the json decoding doesnt happen in the parent either
+    with open(path) as f:
+        return parse_columns(json.load(f))
+
+
+def parse_files(paths, workers=PARSE_WORKERS):
+    # results come back in the same order as paths
+    # a handful of chunks isnt worth starting processes for
+    if workers <= 1 or len(paths) < PARSE_MIN_CHUNKS:
+        return [parse_file(p) for p in paths]
+    # hand them out in batches, a few per worker, instead of one at a time
+    batch = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_file, paths, chunksize=batch))
+
+
+def load_existing(path=OUTPUT_FILE):
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path, parse_dates=["date"])
+    if df.empty:
+        return None
     return df
 
 
-def main():
+def incremental_start_years(existing, series_ids, default_start):
+    # figure out the first year we need for each series
+    # anything missing from the store gets the full window
+    starts = {}
+    for series_id in series_ids:
+        col = SERIES[series_id]
+        start = default_start
+        if existing is not None and col in existing.columns:
+            dates = existing.loc[existing[col].notna(), "date"]
+            if not dates.empty:
+                first_needed = dates.max() - pd.DateOffset(months=REVISION_MONTHS)
+                start = max(default_start, first_needed.year)
+        starts[series_id] = start
+    return starts
+
+
+def full_start_years(existing, series_ids, default_start):
+    # a full refresh goes back as far as the store already does, so it never
+    # throws away history that a --start-year backfill pulled in
+    starts = {}
+    for series_id in series_ids:
+        col = SERIES[series_id]
+        start = default_start
+        if existing is not None and col in existing.columns:
+            dates = existing.loc[existing[col].notna(), "date"]
+            if not dates.empty:
+                start = min(default_start, dates.min().year)
+        starts[series_id] = start
+    return starts
+
+
+def merge_into_store(existing, new):
+    # new numbers win, anything we didnt refetch stays as is
+    old = existing.set_index("date")
+    new = new.set_index("date")
+    merged = new.combine_first(old)
+    columns = list(old.columns) + [c for c in new.columns if c not in old.columns]
+    return merged[columns].reset_index()
+
+
+def main(full_refresh=False, max_workers=MAX_WORKERS, start_year=None,
+         use_cache=True, offline=OFFLINE, parse_workers=PARSE_WORKERS, vintage=None):
     api_key = os.environ.get("BLS_API_KEY")
     if api_key:
         print("Found API key")
@@ -121,37 +540,122 @@ def main():
     os.makedirs("data", exist_ok=True)
     
     current_year = datetime.now().year
-    start_year = current_year - 9
+    default_start = current_year - LOOKBACK_YEARS
+    all_series = list(SERIES.keys())
     
-    print(f"Pulling data from {start_year} to {current_year}...")
+    # backfilling further back always refetches the whole range
+    if start_year is not None:
+        default_start = start_year
+        full_refresh = True
     
-    # public API caps at 20 series per request
-    all_series = list(SERIES.keys())
-    chunks = [all_series[i:i+20] for i in range(0, len(all_series), 20)]
+    stored = load_existing()
+    existing = None if full_refresh else stored
+    if existing is None:
+        starts = full_start_years(stored, all_series, default_start)
+        print(f"Full refresh from {min(starts.values())} to {current_year}...")
+    else:
+        print("Incremental update, only pulling recent years...")
+        starts = incremental_start_years(existing, all_series, default_start)
+    
+    for year in sorted(set(starts.values())):
+        count = sum(1 for s in starts.values() if s == year)
+        print(f"  {count} series from {year} to {current_year}")
     
-    dataframes = []
-    for i, chunk in enumerate(chunks):
-        print(f"  Chunk {i+1}/{len(chunks)}...")
-        response = fetch_from_bls(chunk, start_year, current_year, api_key)
-        df = parse_response(response)
-        if not df.empty:
-            dataframes.append(df)
+    jobs = plan_requests(starts, current_year, api_key)
+    print(f"  Fetching {len(jobs)} chunks ({max_workers} at a time)...")
+    with instrument.span("fetch_all", chunks=len(jobs), workers=max_workers):
+        fetch_chunks(jobs, api_key, max_workers, use_cache, offline, keep=False)
+    
+    # workers read the saved responses and send back plain arrays
+    workers = parse_workers if len(jobs) >= PARSE_MIN_CHUNKS else 1
+    print(f"  Parsing {len(jobs)} chunks ({workers} processes)...")
+    with instrument.span("parse", chunks=len(jobs), workers=workers):
+        parsed = parse_files([saved_response(job) for job in jobs], workers)
+        dataframes = [columns_to_frame(p) for p in parsed if p is not None]
+    del parsed
     
     if not dataframes:
         print("No data collected!")
         return
     
-    # merge chunks together
-    result = dataframes[0]
-    for df in dataframes[1:]:
-        result = result.merge(df, on="date", how="outer")
+    # put the chunks and year windows back together
+    # from here on the whole dataset is in memory at once
+    with instrument.span("combine", frames=len(dataframes)):
+        result = combine_frames(dataframes)
+    
+    if existing is not None:
+        with instrument.span("merge"):
+            result = merge_into_store(existing, result)
     
     result = result.sort_values("date").reset_index(drop=True)
-    result.to_csv(OUTPUT_FILE, index=False)
     
-    print(f"\nSaved {len(result)} rows to {OUTPUT_FILE}")
-    print(f"Columns: {len(result.columns)}")
+    # log what changed before the snapshot gets overwritten, the very first
+    # run starts the log with whatever data was already there
+    vintage = vintage or datetime.now().strftime("%Y-%m-%d")
+    with instrument.span("revisions") as span:
+        if not os.path.exists(revisions.LOG_FILE):
+            revisions.seed(stored)
+        changed = revisions.record(result, vintage)
+        span.set(changed=changed)
+    
+    with instrument.span("write", rows=len(result), columns=len(result.columns) - 1):
+        store.write_csv(result, OUTPUT_FILE)
+        store.write_parquet(result, PARQUET_FILE)
+    
+    # yoy, mom and wage x employment so the dashboard just slices columns
+    with instrument.span("derived"):
+        derived = store.build_derived(result)
+        store.write_parquet(derived, DERIVED_FILE)
+    
+    # quarterly / annual / rolling averages for the dashboard's frequency picker
+    with instrument.span("rollups"):
+        rollups = store.build_rollups(result)
+        store.write_rollups(rollups, ROLLUP_FILE)
+    
+    # tells running dashboards theres new data
+    manifest = store.write_manifest()
+    
+    print(f"\nSaved {len(result)} rows to {OUTPUT_FILE} and {PARQUET_FILE}")
+    print(f"Columns: {len(result.columns)}, derived: {len(derived.columns) - 1}, rollup rows: {len(rollups)}")
+    print(f"Data version: {manifest['version']}")
+    print(f"Logged {changed} new or revised values as vintage {vintage} in {revisions.LOG_FILE}")
+    
+    # everything made it, next run starts fresh
+    clear_checkpoint()
+    if use_cache and not offline:
+        prune_cache()
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Pull BLS data")
+    parser.add_argument("--full", action="store_true",
+                        help="refetch the whole window, use this after the annual benchmark revisions")
+    parser.add_argument("--start-year", type=int,
+                        help="backfill from this year, e.g. 1990 (implies --full)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="skip the on-disk response cache")
+    parser.add_argument("--offline", action="store_true",
+                        help="only replay cached responses, never call the API")
+    parser.add_argument("--vintage",
+                        help="name for this run in the revision log (default today's date)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a json line per stage and chunk (timings, counts) to FILE")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="add memory use to the trace, makes the run slower")
+    args = parser.parse_args()
+    
+    trace = open(args.trace, "w") if args.trace else None
+    if trace:
+        instrument.start(memory=args.trace_memory, sink=trace)
+    try:
+        with instrument.span("main"):
+            main(full_refresh=args.full, start_year=args.start_year,
+                 use_cache=not args.no_cache, offline=args.offline or OFFLINE,
+                 vintage=args.vintage)
+    finally:
+        if trace:
+            # last line is a summary with totals per stage and the counters
+            instrument.stop()
+            trace.close()
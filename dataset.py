@@ -0,0 +1,209 @@
+# dataset.py
+# Trenton Sedlacek ECON 8320
+# one read-only copy of the data shared by every session
+# date filtering is a binary search on the sorted months and returns a view, not a copy
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrument
+import store
+
+# how often to look for new data, in seconds
+RELOAD_CHECK_SECONDS = 30
+
+
+def month_ordinals(dates):
+    # months since Jan 1970 as int32, the time axis for everything
+    return np.asarray(dates, dtype="datetime64[M]").astype(np.int32)
+
+
+class Dataset:
+    # every series in one float32 block, months down and series across
+    # column major so each series is one contiguous run, which is what a chart reads
+    # sessions get Views (a pair of row numbers) instead of copies
+    
+    def __init__(self, df, version, rollups=None):
+        # rows are sorted by date, one per month (or quarter / year for a rollup)
+        df = df.sort_values("date")
+        self.version = version
+        self.columns = [c for c in df.columns if c != "date"]
+        self.col_index = {c: j for j, c in enumerate(self.columns)}
+        
+        # pandas already lays the columns out this way, so this is usually one copy
+        self.values = np.asfortranarray(df[self.columns].to_numpy(dtype=np.float32))
+        self.values.flags.writeable = False
+        
+        self.months = month_ordinals(df["date"])
+        # plotly and the date slider want real dates, one small shared array
+        self.dates = self.months.astype("datetime64[M]").astype("datetime64[ns]")
+        # frequency -> Dataset of precomputed averages, see store.ROLLUPS
+        self.rollups = rollups or {}
+    
+    def __len__(self):
+        return len(self.months)
+    
+    def __contains__(self, col):
+        return col in self.col_index
+    
+    def __getitem__(self, col):
+        # one whole series, a read only view
+        if col == "date":
+            return self.dates
+        return self.values[:, self.col_index[col]]
+    
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.months.nbytes + self.dates.nbytes
+    
+    @property
+    def min_date(self):
+        return self.dates[0].astype("datetime64[D]").item()
+    
+    @property
+    def max_date(self):
+        return self.dates[-1].astype("datetime64[D]").item()
+    
+    def index_range(self, start, end):
+        # rows i0 up to (not including) i1 fall inside [start, end]
+        i0 = np.searchsorted(self.dates, np.datetime64(start), side="left")
+        i1 = np.searchsorted(self.dates, np.datetime64(end), side="right")
+        return int(i0), int(i1)
+    
+    def between(self, start, end):
+        # just the row numbers, nothing gets copied
+        i0, i1 = self.index_range(start, end)
+        return View(self, i0, i1)
+
+
+class View:
+    # rows i0:i1 of a Dataset, this is all a session holds on to
+    # columns come back as numpy views into the shared block, treat them as read only
+    
+    def __init__(self, data, i0, i1):
+        self.data = data
+        self.i0 = i0
+        self.i1 = i1
+    
+    def __len__(self):
+        return self.i1 - self.i0
+    
+    @property
+    def columns(self):
+        return self.data.columns
+    
+    @property
+    def dates(self):
+        return self.data.dates[self.i0:self.i1]
+    
+    @property
+    def months(self):
+        return self.data.months[self.i0:self.i1]
+    
+    @property
+    def min_date(self):
+        return self.dates[0].astype("datetime64[D]").item()
+    
+    @property
+    def max_date(self):
+        return self.dates[-1].astype("datetime64[D]").item()
+    
+    def __contains__(self, col):
+        return col in self.data.col_index
+    
+    def __getitem__(self, col):
+        if col == "date":
+            return self.dates
+        return self.data.values[self.i0:self.i1, self.data.col_index[col]]
+    
+    def has_data(self, col):
+        return col in self.data.col_index and not np.isnan(self[col]).all()
+    
+    def to_frame(self, columns=None):
+        # a DataFrame for the raw data table and exports, only built when asked for
+        # a run of neighbouring columns (e.g. all the raw ones) is wrapped without copying
+        columns = [c for c in (columns or self.columns) if c != "date"]
+        idx = [self.data.col_index[c] for c in columns]
+        rows = slice(self.i0, self.i1)
+        if idx and idx == list(range(idx[0], idx[0] + len(idx))):
+            block = self.data.values[rows, idx[0]:idx[0] + len(idx)]
+        else:
+            block = self.data.values[rows][:, idx]
+        df = pd.DataFrame(block, columns=columns, copy=False)
+        df.insert(0, "date", self.dates)
+        return df
+
+
+def load(version, columns=None):
+    # reads the parquet store if its there, otherwise the csv
+    with instrument.span("read_data"):
+        df = store.read_data(columns)
+    if df is None or df.empty:
+        return None
+    # yoy growth, mom changes and wage x employment come precomputed
+    with instrument.span("read_derived"):
+        derived = store.read_derived(df)
+    # quarterly / annual / rolling averages, the dashboard just slices these
+    with instrument.span("read_rollups"):
+        rollups = {k: Dataset(v, version) for k, v in store.read_rollups(df).items()}
+    with instrument.span("merge", rows=len(df)):
+        return Dataset(df.merge(derived, on="date", how="left"), version, rollups)
+
+
+def from_frame(df, version):
+    # same as load but for data thats already in memory, e.g. an older vintage
+    # rebuilt from the revision log, so derived columns and rollups get worked out here
+    with instrument.span("build_derived"):
+        derived = store.build_derived(df)
+    with instrument.span("build_rollups"):
+        rollups = {k: Dataset(v, version) for k, v in store.split_rollups(store.build_rollups(df)).items()}
+    return Dataset(df.merge(derived, on="date", how="left"), version, rollups)
+
+
+class LiveDataset:
+    # holds the current Dataset and swaps in a new one when the files change
+    # the new one loads on a background thread, readers keep the old one until
+    # its ready and then pick up the new one on their next request
+    
+    def __init__(self, check_every=RELOAD_CHECK_SECONDS):
+        self.check_every = check_every
+        self.current = None
+        self.loading = None
+        self.last_check = 0.0
+        self.lock = threading.Lock()
+    
+    def get(self):
+        if self.current is None:
+            # nothing to show yet so the first load has to block
+            with self.lock:
+                if self.current is None:
+                    self.current = load(store.data_version())
+                    self.last_check = time.monotonic()
+            return self.current
+        
+        now = time.monotonic()
+        if now - self.last_check >= self.check_every:
+            self.last_check = now
+            self.check()
+        return self.current
+    
+    def check(self):
+        version = store.data_version()
+        with self.lock:
+            if version == self.current.version or version == self.loading:
+                return
+            self.loading = version
+        threading.Thread(target=self.reload, args=(version,), daemon=True).start()
+    
+    def reload(self, version):
+        try:
+            new = load(version)
+            if new is not None:
+                # plain attribute swap, anyone mid render still has the old object
+                self.current = new
+        finally:
+            with self.lock:
+                self.loading = None
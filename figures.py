@@ -0,0 +1,139 @@
+# figures.py
+# Trenton Sedlacek ECON 8320
+# builds the plotly charts
+# figures are cached by (chart, date range, sectors, frequency, data version) so a rerun
+# that didnt change a chart's inputs gets it back without touching plotly
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+import instrument
+import store
+
+# how many figures to keep around, oldest get dropped first
+FIGURE_CACHE_SIZE = 256
+
+# sector charts are full width, roughly this many pixels across
+CHART_WIDTH = 1200
+
+# total points a sector chart sends to the browser, more than ~2 per pixel
+# cant be seen anyway. each trace gets a share but never less than MIN_POINTS
+POINT_BUDGET = 2 * CHART_WIDTH
+MIN_POINTS = 150
+
+# overview charts, column -> (title, y axis, line color)
+OVERVIEW_CHARTS = {
+    "total_nonfarm": ("Total Nonfarm Employment", "Thousands", None),
+    "unemployment_rate": ("Unemployment Rate", "Percent", "red"),
+    "lfpr": ("Labor Force Participation", "Percent", "green"),
+    "total_private_wage": ("Avg Hourly Earnings", "Dollars", "orange"),
+}
+
+# sector charts, id -> (sector field, yoy or not, title, y axis)
+SECTOR_CHARTS = {
+    "sector_emp": ("emp", False, "Employment by Sector (Thousands)", "Thousands"),
+    "sector_emp_yoy": ("emp", True, None, "Percent"),
+    "sector_wage": ("wage", False, "Avg Hourly Earnings by Sector", "Dollars"),
+    "sector_wage_yoy": ("wage", True, None, "Percent"),
+}
+
+
+def overview_line(df, col):
+    # df is a dataset.View, px takes the arrays straight from it
+    title, y_title, color = OVERVIEW_CHARTS[col]
+    fig = px.line(x=df["date"], y=df[col], title=title, labels={"x": "date", "y": col})
+    if color:
+        fig.update_traces(line_color=color)
+    fig.update_layout(yaxis_title=y_title, xaxis_title="")
+    return fig
+
+
+def lttb(x, y, n_out):
+    # largest triangle three buckets: picks n_out points that keep the
+    # shape of the line, peaks and troughs included. x must be sorted numbers
+    # returns the indices to keep
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    
+    # first and last points are always kept, the rest go into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # third corner is the average of the next bucket
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(dates, values, n_out):
+    # short ranges (zoomed in) come back exactly as they are
+    if len(values) <= n_out:
+        return dates, values
+    ok = ~np.isnan(values)
+    dates, values = dates[ok], values[ok]
+    keep = lttb(dates.astype("int64").astype(np.float64), values, n_out)
+    return dates[keep], values[keep]
+
+
+def sector_lines(df, series, title, y_title, yoy):
+    # series is a list of (column, label), df is a dataset.View
+    # each trace is the only copy made, and only of the points that get sent
+    fig = go.Figure()
+    n_out = max(MIN_POINTS, POINT_BUDGET // max(1, len(series)))
+    dates = df["date"]
+    for col, label in series:
+        y = df[store.yoy_col(col)] if yoy else df[col]
+        x, y = downsample(dates, y.astype(np.float64), n_out)
+        fig.add_trace(go.Scatter(x=x, y=y, name=label, mode="lines"))
+    
+    if yoy:
+        fig.update_layout(
+            height=400, yaxis_title=y_title, xaxis_title="",
+            hovermode="x unified", legend=dict(orientation="h", y=-0.15)
+        )
+        fig.add_hline(y=0, line_dash="dash", line_color="gray")
+    else:
+        fig.update_layout(
+            title=title, height=500,
+            yaxis=dict(rangemode="tozero", title=y_title),
+            xaxis_title="", hovermode="x unified",
+            legend=dict(orientation="h", y=-0.15)
+        )
+    return fig
+
+
+@st.cache_data(max_entries=FIGURE_CACHE_SIZE, show_spinner=False)
+def get_figure(chart_id, date_range, sectors, freq, version, _df, _sectors):
+    # only the first five arguments make up the cache key, the underscore ones
+    # arent hashed: _df is already filtered to date_range for this version and
+    # is the monthly data or one of the precomputed rollups for freq
+    # this only runs on a cache miss, so the span shows up when a figure gets built
+    instrument.count("figures_built")
+    with instrument.span("build_figure", chart=chart_id, freq=freq):
+        if chart_id in OVERVIEW_CHARTS:
+            fig = overview_line(_df, chart_id)
+        else:
+            field, yoy, title, y_title = SECTOR_CHARTS[chart_id]
+            series = []
+            for sec in sectors:
+                col = _sectors[sec][field]
+                if col and col in _df:
+                    series.append((col, _sectors[sec]["label"]))
+            fig = sector_lines(_df, series, title, y_title, yoy)
+        
+        if freq != "Monthly" and fig.layout.title.text:
+            fig.update_layout(title=f"{fig.layout.title.text} ({freq})")
+        return fig
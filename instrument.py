@@ -0,0 +1,190 @@
+# instrument.py
+# Trenton Sedlacek ECON 8320
+# timing and memory spans plus counters for the collector and the dashboard
+# nothing is recorded until a Recorder is started, before that span() hands back
+# one shared do-nothing object and count() returns right away
+#
+#   with instrument.span("parse", chunk=3) as s:
+#       df = parse_response(response)
+#       s.set(rows=len(df))
+#   instrument.count("requests")
+
+import json
+import threading
+import time
+import tracemalloc
+
+
+# the dashboard records per script run (one thread), the collector records the
+# whole process so the fetch threads show up too
+class _ThreadState(threading.local):
+    # class default so a thread that never started one reads None cheaply
+    recorder = None
+
+
+_local = _ThreadState()
+_process = None
+
+
+class Recorder:
+    def __init__(self, memory=False, sink=None):
+        # memory uses tracemalloc, which slows python down a fair bit, so its separate
+        # sink is an open file, each finished span goes in as one line of json
+        self.memory = memory
+        self.sink = sink
+        self.spans = []
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.open = threading.local()
+        self.t0 = time.perf_counter()
+        self.started_tracing = False
+        self.closed = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+    
+    def stack(self):
+        # spans open on this thread, for nesting
+        if not hasattr(self.open, "stack"):
+            self.open.stack = []
+        return self.open.stack
+    
+    def add(self, record):
+        with self.lock:
+            self.spans.append(record)
+            if self.sink:
+                self.sink.write(json.dumps(record) + "\n")
+                self.sink.flush()
+    
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+    
+    def elapsed(self):
+        return time.perf_counter() - self.t0
+    
+    def totals(self):
+        # name -> (calls, total seconds), a span name can show up many times
+        out = {}
+        for s in self.spans:
+            calls, seconds = out.get(s["span"], (0, 0.0))
+            out[s["span"]] = (calls + 1, seconds + s["seconds"])
+        return out
+    
+    def summary(self):
+        summary = {
+            "summary": True,
+            "seconds": round(self.elapsed(), 6),
+            "stages": {k: {"calls": c, "seconds": round(t, 6)} for k, (c, t) in self.totals().items()},
+            "counters": dict(self.counters),
+        }
+        if self.memory and tracemalloc.is_tracing():
+            summary["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 3)
+        return summary
+    
+    def close(self):
+        # safe to call twice
+        if self.closed:
+            return
+        self.closed = True
+        if self.sink:
+            self.sink.write(json.dumps(self.summary()) + "\n")
+            self.sink.flush()
+        if self.started_tracing:
+            tracemalloc.stop()
+
+
+class Span:
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+    
+    def set(self, **attrs):
+        # extra details only known once the work is done, e.g. row counts
+        self.attrs.update(attrs)
+    
+    def __enter__(self):
+        stack = self.recorder.stack()
+        self.depth = len(stack)
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.mem = tracemalloc.get_traced_memory()[0] if self.recorder.memory and tracemalloc.is_tracing() else None
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        self.recorder.stack().pop()
+        record = {
+            "span": self.name,
+            "start": round(self.start - self.recorder.t0, 6),
+            "seconds": round(seconds, 6),
+            "depth": self.depth,
+            "parent": self.parent,
+            "thread": threading.current_thread().name,
+        }
+        record.update(self.attrs)
+        if self.mem is not None and tracemalloc.is_tracing():
+            # memory still held at the end of the span, not the peak inside it
+            # approximate when other threads are allocating at the same time
+            record["mem_mb"] = round((tracemalloc.get_traced_memory()[0] - self.mem) / 1e6, 3)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        self.recorder.add(record)
+        return False
+
+
+class NoSpan:
+    # what span() returns when nothing is recording
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def set(self, **attrs):
+        pass
+
+
+NO_SPAN = NoSpan()
+
+
+def current():
+    return _local.recorder or _process
+
+
+def start(memory=False, sink=None, local=False):
+    # local=True only records on this thread (one dashboard session's run)
+    global _process
+    recorder = Recorder(memory, sink)
+    if local:
+        _local.recorder = recorder
+    else:
+        _process = recorder
+    return recorder
+
+
+def stop(local=False):
+    global _process
+    if local:
+        recorder = _local.recorder
+        _local.recorder = None
+    else:
+        recorder, _process = _process, None
+    if recorder is not None:
+        recorder.close()
+    return recorder
+
+
+def span(name, **attrs):
+    recorder = _local.recorder or _process
+    if recorder is None:
+        return NO_SPAN
+    return Span(recorder, name, attrs)
+
+
+def count(name, n=1):
+    recorder = _local.recorder or _process
+    if recorder is not None:
+        recorder.count(name, n)
@@ -0,0 +1,63 @@
+# registry.py
+# Trenton Sedlacek ECON 8320
+# one list of every BLS series we track, shared by the collector and the dashboard
+#
+# data/series.csv has one row per series:
+#   series_id     BLS id, CES employment ends in 01 and wages end in 03
+#   column        column name in the data files
+#   label         name shown in the raw data table
+#   unit          thousands / dollars / percent
+#   sector        sector key, blank for the national numbers
+#   sector_label  name shown in the sector picker
+#   measure       employment / wage / rate
+#   seasonal      1 if seasonally adjusted
+# the 11 supersectors add up to total nonfarm without double counting,
+# government doesnt have a wage series
+
+import csv
+import os
+from functools import lru_cache
+
+# next to this file, so it works no matter where things are run from
+REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "series.csv")
+
+
+class Registry:
+    def __init__(self, rows):
+        self.rows = rows
+        
+        # everything below is built once here so lookups are just dict hits
+        # series id -> column, what the collector needs
+        self.series = {r["series_id"]: r["column"] for r in rows}
+        
+        # prettier names for the raw data table
+        self.labels = {"date": "Date"}
+        self.labels.update({r["column"]: r["label"] for r in rows})
+        
+        # sector -> {"emp": col, "wage": col or None, "label": name}
+        by_sector = {}
+        for r in rows:
+            if r["sector"]:
+                by_sector.setdefault(r["sector"], []).append(r)
+        self.sectors = {}
+        for sector, sector_rows in by_sector.items():
+            measures = {r["measure"]: r["column"] for r in sector_rows}
+            self.sectors[sector] = {
+                "emp": measures.get("employment"),
+                "wage": measures.get("wage"),
+                "label": sector_rows[0]["sector_label"],
+            }
+
+
+def read_registry(path=REGISTRY_FILE):
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    for r in rows:
+        r["seasonal"] = r["seasonal"] == "1"
+    return Registry(rows)
+
+
+@lru_cache(maxsize=None)
+def load(path=REGISTRY_FILE):
+    # read once per process
+    return read_registry(path)
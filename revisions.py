@@ -0,0 +1,130 @@
+# revisions.py
+# Trenton Sedlacek ECON 8320
+# append-only log of every value the collector has changed, one row per
+# (vintage, column, date, value). a vintage is one collector run, named by its date
+# the data files are the current snapshot, the log is how they got there, so
+# any past run can be rebuilt without keeping a copy of it
+#
+# rows are only ever added to the end, so the log is in vintage order and a
+# later row for the same column and month wins. an empty value means the month
+# was dropped. the first run starts the log with whatever data was already there
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import store
+
+LOG_FILE = store.REVISION_LOG
+LOG_COLUMNS = ["vintage", "column", "date", "value"]
+
+# vintage for the data that was there before the log started
+SEED_VINTAGE = "initial"
+
+
+def read_log(path=LOG_FILE):
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(
+        path,
+        dtype={"vintage": "category", "column": "category", "value": "float64"},
+        parse_dates=["date"],
+    )
+
+
+def vintages(path=LOG_FILE):
+    # oldest first, only reads the one column
+    if not os.path.exists(path):
+        return []
+    log = pd.read_csv(path, usecols=["vintage"], dtype={"vintage": str})
+    return list(dict.fromkeys(log["vintage"]))
+
+
+def snapshot(log, as_of=None):
+    # the wide data as it was right after vintage as_of (default the latest run)
+    # same shape as the data files, date column first
+    if as_of is not None:
+        rows = np.flatnonzero((log["vintage"] == as_of).to_numpy())
+        if len(rows) == 0:
+            raise ValueError(f"No vintage {as_of} in the revision log")
+        log = log.iloc[:rows[-1] + 1]
+    
+    latest = log.drop_duplicates(["column", "date"], keep="last")
+    wide = latest.pivot(index="date", columns="column", values="value")
+    # columns in the order they first showed up, like the data files
+    order = [c for c in dict.fromkeys(log["column"]) if c in wide.columns]
+    wide = wide[order].dropna(how="all").dropna(axis=1, how="all")
+    wide.columns = list(wide.columns)
+    return wide.sort_index().reset_index()
+
+
+def changes(old, new):
+    # every cell of new thats different from old (or not in old), plus
+    # cells that are in old but gone from new, as (column, date, value) rows
+    new = new.set_index("date")
+    if old is None:
+        old = pd.DataFrame(index=new.index[:0])
+    else:
+        old = old.set_index("date")
+    # keep the data file's column order, align would sort them
+    columns = list(new.columns) + [c for c in old.columns if c not in new.columns]
+    dates = new.index.union(old.index)
+    old = old.reindex(index=dates, columns=columns)
+    new = new.reindex(index=dates, columns=columns)
+    
+    o = old.to_numpy(dtype=np.float64)
+    n = new.to_numpy(dtype=np.float64)
+    changed = ~((o == n) | (np.isnan(o) & np.isnan(n)))
+    
+    # column by column, then by month, so a run's rows read in order
+    c, r = np.nonzero(changed.T)
+    return pd.DataFrame({
+        "column": new.columns.to_numpy()[c],
+        "date": new.index.to_numpy()[r],
+        "value": n[r, c],
+    })
+
+
+def append(rows, vintage, path=LOG_FILE):
+    if rows.empty:
+        return 0
+    rows = rows.assign(vintage=vintage)[LOG_COLUMNS]
+    header = not os.path.exists(path)
+    rows.to_csv(path, mode="a", header=header, index=False, date_format="%Y-%m-%d")
+    return len(rows)
+
+
+def seed(df, path=LOG_FILE):
+    # start the log from data that was collected before it existed
+    if df is None or os.path.exists(path):
+        return 0
+    return append(changes(None, df), SEED_VINTAGE, path)
+
+
+def record(new, vintage, path=LOG_FILE):
+    # log whatever this run changed compared to the log's current snapshot
+    log = read_log(path)
+    old = snapshot(log) if log is not None and not log.empty else None
+    return append(changes(old, new), vintage, path)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Rebuild the data from the revision log")
+    parser.add_argument("--as-of", help="vintage to rebuild (default the latest)")
+    parser.add_argument("--out", help="write the rebuilt data to this csv")
+    args = parser.parse_args()
+    
+    log = read_log()
+    if log is None:
+        raise SystemExit(f"No revision log at {LOG_FILE}, run collect_data.py first")
+    
+    if args.out:
+        snapshot(log, args.as_of).to_csv(args.out, index=False)
+        print(f"Wrote {args.out}")
+    else:
+        counts = log["vintage"].value_counts(sort=False)
+        for vintage in vintages():
+            print(f"{vintage}: {counts[vintage]} values")
@@ -0,0 +1,279 @@
+# store.py
+# Trenton Sedlacek ECON 8320
+# reading and writing the data files
+# the csv and the revision log are what gets committed, the parquet files are
+# faster local copies the collector builds next to them (see .gitignore)
+
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CSV_FILE = "data/bls_data.csv"
+PARQUET_FILE = "data/bls_data.parquet"
+DERIVED_FILE = "data/bls_derived.parquet"
+ROLLUP_FILE = "data/bls_rollup.parquet"
+# written by revisions.py, part of the data version so a new vintage shows up
+REVISION_LOG = "data/revisions.csv"
+MANIFEST_FILE = "data/manifest.json"
+
+# everything is stored as float32, plenty for thousands of jobs and cents
+VALUE_DTYPE = "float32"
+
+# averages the collector precomputes, frequency -> (kind, months)
+# "period" averages whole quarters / years, "rolling" is a trailing average
+# over the last n months. monthly is just the data itself
+ROLLUPS = {
+    "Quarterly": ("period", 3),
+    "Annual": ("period", 12),
+    "3-month avg": ("rolling", 3),
+    "6-month avg": ("rolling", 6),
+    "12-month avg": ("rolling", 12),
+}
+
+# exports get written this many rows at a time
+EXPORT_CHUNK_ROWS = 5000
+
+# label -> (file extension, mime type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def yoy_col(col):
+    return f"{col}_yoy"
+
+
+def mom_col(col):
+    return f"{col}_mom"
+
+
+def wagebill_col(wage_col):
+    # wage x employment for a sector, summing these and dividing by
+    # summed employment gives the employment weighted wage
+    return wage_col[:-len("_wage")] + "_wagebill"
+
+
+def is_derived(col):
+    return col.endswith(("_yoy", "_mom", "_wagebill"))
+
+
+def build_derived(df):
+    # stuff that only depends on the data, so the dashboard never has to compute it
+    # shift(12) needs every month present, so fill any gaps first
+    data = df.set_index("date").sort_index()
+    months = pd.date_range(data.index.min(), data.index.max(), freq="MS")
+    data = data.reindex(months)
+    
+    derived = {}
+    for col in data.columns:
+        derived[yoy_col(col)] = (data[col] / data[col].shift(12) - 1) * 100
+        derived[mom_col(col)] = data[col].diff()
+    
+    for col in data.columns:
+        emp = col[:-len("_wage")] + "_emp"
+        if col.endswith("_wage") and emp in data.columns:
+            derived[wagebill_col(col)] = data[col] * data[emp]
+    
+    out = pd.DataFrame(derived, index=data.index)
+    out = out.loc[df["date"].sort_values()]
+    out.index.name = "date"
+    return out.reset_index()
+
+
+def build_rollups(df):
+    # every series averaged at every frequency in ROLLUPS, plus the yoy growth
+    # of those averages. comes back long, one block of rows per frequency
+    data = df.set_index("date").sort_index()
+    data = data[[c for c in data.columns if not is_derived(c)]]
+    months = pd.date_range(data.index.min(), data.index.max(), freq="MS")
+    data = data.reindex(months)
+    
+    frames = []
+    for name, (kind, n) in ROLLUPS.items():
+        if kind == "period":
+            # labeled by the first month, only whole periods count so the
+            # current half finished year doesnt look like a drop
+            key = (months.year * 12 + months.month - 1) // n
+            groups = data.groupby(key)
+            out = groups.mean().where(groups.count() == n)
+            out.index = pd.Series(months).groupby(key).first().to_numpy()
+            lag = 12 // n
+        else:
+            # labeled by the last month in the window
+            out = data.rolling(n, min_periods=n).mean()
+            lag = 12
+        
+        out = pd.concat([out, (out / out.shift(lag) - 1) * 100], axis=1, keys=["level", "yoy"])
+        out.columns = list(data.columns) + [yoy_col(c) for c in data.columns]
+        out = out.dropna(how="all")
+        out.index.name = "date"
+        out = out.reset_index()
+        out.insert(0, "rollup", name)
+        frames.append(out)
+    
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_rollups(rollups, path=ROLLUP_FILE):
+    # one file for all of them, the frequency name is a dictionary encoded column
+    out = rollups.astype({c: VALUE_DTYPE for c in rollups.columns if c not in ("rollup", "date")})
+    out["rollup"] = pd.Categorical(out["rollup"], categories=list(ROLLUPS))
+    tmp = path + ".tmp"
+    out.to_parquet(tmp, engine="pyarrow", index=False)
+    os.replace(tmp, path)
+
+
+def read_rollups(df=None):
+    # frequency -> frame with a date column, built from df if the file isnt there
+    if is_current(ROLLUP_FILE):
+        rollups = pd.read_parquet(ROLLUP_FILE, engine="pyarrow")
+    elif df is not None:
+        rollups = build_rollups(df)
+    else:
+        return {}
+    return split_rollups(rollups)
+
+
+def split_rollups(rollups):
+    return {
+        name: group.drop(columns="rollup").reset_index(drop=True)
+        for name, group in rollups.groupby("rollup", observed=True, sort=False)
+    }
+
+
+def write_parquet(df, path=PARQUET_FILE):
+    # month periods as the index instead of a date string column
+    out = df.drop(columns="date").astype(VALUE_DTYPE)
+    out.index = pd.PeriodIndex(df["date"], freq="M", name="date")
+    tmp = path + ".tmp"
+    out.to_parquet(tmp, engine="pyarrow")
+    os.replace(tmp, path)
+
+
+def write_csv(df, path=CSV_FILE):
+    # to a temp file first so a reader never sees half of it
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def is_current(path):
+    # a parquet file older than the csv (e.g. after a git pull brought in new
+    # data) was built from old numbers, so its skipped and rebuilt from the csv
+    if not os.path.exists(path):
+        return False
+    return not os.path.exists(CSV_FILE) or os.path.getmtime(path) >= os.path.getmtime(CSV_FILE)
+
+
+def read_parquet(path=PARQUET_FILE, columns=None):
+    # only the requested columns are read off disk, the index always comes along
+    df = pd.read_parquet(path, engine="pyarrow", columns=columns)
+    df.index = df.index.to_timestamp()
+    return df.reset_index()
+
+
+def read_csv(path=CSV_FILE, columns=None):
+    usecols = None if columns is None else ["date"] + list(columns)
+    df = pd.read_csv(path, parse_dates=["date"], usecols=usecols)
+    if columns is not None:
+        df = df[usecols]
+    return df
+
+
+def read_derived(df=None, columns=None):
+    # the collector writes this, but build it from the data if its missing
+    if is_current(DERIVED_FILE):
+        return read_parquet(DERIVED_FILE, columns)
+    if df is None:
+        return None
+    derived = build_derived(df)
+    if columns is not None:
+        derived = derived[["date"] + list(columns)]
+    return derived
+
+
+def data_files():
+    # the committed files, everything else is built from these so the version
+    # only changes when the data does
+    return [p for p in (CSV_FILE, REVISION_LOG) if os.path.exists(p)]
+
+
+def content_hash(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def write_manifest(path=MANIFEST_FILE):
+    # written last by the collector, the dashboard watches this one small file
+    # no timestamp in here so an unchanged run doesnt make a new commit
+    paths = data_files()
+    manifest = {"version": content_hash(paths), "files": paths}
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return manifest
+
+
+# (mtime, size) stamp -> content hash, so files only get hashed when they change
+_hash_cache = {}
+
+
+def data_version():
+    # the manifest from the collector is the cheapest answer
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)["version"]
+    
+    # no manifest (e.g. data copied in by hand), hash the files themselves
+    paths = data_files()
+    stamp = tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+    if stamp not in _hash_cache:
+        _hash_cache.clear()
+        _hash_cache[stamp] = content_hash(paths)
+    return _hash_cache[stamp]
+
+
+def read_data(columns=None):
+    # prefer parquet, fall back to the csv if it hasnt been built yet (or is stale)
+    if is_current(PARQUET_FILE):
+        df = read_parquet(columns=columns)
+    elif os.path.exists(CSV_FILE):
+        df = read_csv(columns=columns)
+    else:
+        return None
+    return df.sort_values("date").reset_index(drop=True)
+
+
+def export_frame(df, fmt="CSV", columns=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    # writes the file a chunk of rows at a time instead of one giant string
+    # columns=None means all of them, date always comes first
+    columns = [c for c in (columns or df.columns) if c != "date"]
+    df = df[["date"] + columns]
+    buf = io.BytesIO()
+    
+    if fmt == "CSV":
+        if df.empty:
+            df.to_csv(buf, index=False)
+        for i in range(0, len(df), chunk_rows):
+            df.iloc[i:i + chunk_rows].to_csv(buf, index=False, header=(i == 0))
+    elif fmt == "Parquet":
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        with pq.ParquetWriter(buf, schema) as writer:
+            for i in range(0, len(df), chunk_rows):
+                chunk = pa.Table.from_pandas(df.iloc[i:i + chunk_rows], schema=schema, preserve_index=False)
+                writer.write_table(chunk)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    
+    return buf.getvalue()